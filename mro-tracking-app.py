@@ -1,12 +1,27 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta, time
+from datetime import datetime, time
 import hashlib
-import io
 import time as pytime
 import secrets
 import string
+import os
+import heapq
+import itertools
+import threading
+import tempfile
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from supabase import create_client, Client
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+from mro_workers import parse_upload, filter_date, process_report_dataframe, write_report_file, build_delivery_file
+from mro_data import AsyncDataLayer
+from mro_search import SearchIndex
 
 # --- 1. CONFIGURATION & SUPABASE CONNECTION ---
 st.set_page_config(layout="wide", page_title="AeroControl Tower", page_icon="✈️")
@@ -89,6 +104,25 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# =============================================================================
+# ASYNC DATA ACCESS (READS)
+# =============================================================================
+@st.cache_resource
+def get_data_layer():
+    return AsyncDataLayer(url, key)
+
+# --- Read queries (coroutines; run them with get_data_layer().run / .gather) ---
+def q_user(email): return get_data_layer().select("users_table", filters=[("email", "eq", email)], timeout=5.0)
+def q_jobs(user_email): return get_data_layer().select("jobs_table", filters=[("owner_email", "eq", user_email)], order="id.desc")
+def q_folders(user_email): return get_data_layer().select("folders_table", filters=[("owner_email", "eq", user_email)], order="created_at")
+def q_folder_jobs(folder_id): return get_data_layer().select("jobs_table", filters=[("folder_id", "eq", folder_id), ("active", "eq", True)])
+def q_folder_owner(folder_id): return get_data_layer().select("folders_table", columns="owner_email", filters=[("id", "eq", folder_id)])
+def q_folder_by_name(name, user_email): return get_data_layer().select("folders_table", columns="id", filters=[("owner_email", "eq", user_email), ("name", "eq", name)])
+def q_jobs_by_name(task_name, user_email, exclude_id=None):
+    filters = [("owner_email", "eq", user_email), ("task_name", "eq", task_name)]
+    if exclude_id: filters.append(("id", "neq", exclude_id))
+    return get_data_layer().select("jobs_table", columns="id", filters=filters)
+
 # =============================================================================
 # SECURITY & DATABASE MODULE
 # =============================================================================
@@ -111,8 +145,8 @@ def save_user(email, password, first_name, last_name, company, role):
 def login_user(email, password):
     hashed_pw = make_hashes(password)
     try:
-        res = supabase.table("users_table").select("*").eq("email", email).execute()
-        if res.data and res.data[0].get('password') == hashed_pw: return res.data[0]
+        users = get_data_layer().run(q_user(email))
+        if users and users[0].get('password') == hashed_pw: return users[0]
     except: pass
     return None
 
@@ -142,39 +176,25 @@ def grant_viewer_access(viewer_email, folder_key):
 def get_viewer_folders(viewer_email):
     """Get folders unlocked by this viewer"""
     try:
-        access_res = supabase.table("viewer_access").select("folder_id").eq("viewer_email", viewer_email).execute()
-        if not access_res.data: return []
+        db = get_data_layer()
+        access = db.run(db.select("viewer_access", columns="folder_id", filters=[("viewer_email", "eq", viewer_email)]))
+        if not access: return []
         
-        ids = [r['folder_id'] for r in access_res.data]
-        folders_res = supabase.table("folders_table").select("*").in_("id", ids).execute()
-        return folders_res.data
+        ids = [r['folder_id'] for r in access]
+        return db.run(db.select("folders_table", filters=[("id", "in", ids)]))
     except: return []
 
 # --- JOB FUNCTIONS ---
-def load_jobs(user_email):
-    try:
-        res = supabase.table("jobs_table").select("*").eq("owner_email", user_email).order("id", desc=True).execute()
-        return res.data if res.data else []
-    except: return []
-
-def load_folder_jobs(folder_id):
-    try:
-        res = supabase.table("jobs_table").select("*").eq("folder_id", folder_id).eq("active", True).execute()
-        return res.data if res.data else []
-    except: return []
-
 def check_duplicate_name(task_name, user_email, exclude_id=None):
     try:
-        query = supabase.table("jobs_table").select("id").eq("owner_email", user_email).eq("task_name", task_name)
-        if exclude_id: query = query.neq("id", exclude_id)
-        res = query.execute()
-        return len(res.data) > 0
+        return len(get_data_layer().run(q_jobs_by_name(task_name, user_email, exclude_id))) > 0
     except: return False
 
 def add_job(job_data):
     try:
         job_data.pop('id', None) 
         res = supabase.table("jobs_table").insert(job_data).execute()
+        invalidate_workspace()
         if res.data: return res.data[0]['id']
         return True
     except: return False
@@ -182,16 +202,11 @@ def add_job(job_data):
 def update_job(job_id, update_data):
     try:
         supabase.table("jobs_table").update(update_data).eq("id", job_id).execute()
+        invalidate_workspace()
         return True
     except: return False
 
 # --- FOLDER FUNCTIONS (AUTOMATIC KEY) ---
-def get_folders(user_email):
-    try:
-        res = supabase.table("folders_table").select("*").eq("owner_email", user_email).order("created_at").execute()
-        return res.data if res.data else []
-    except: return []
-
 def generate_secure_key(length=10):
     """Generates a random secure key"""
     alphabet = string.ascii_uppercase + string.digits
@@ -201,8 +216,7 @@ def create_folder(name, user_email):
     """Creates folder with AUTOMATIC key generation"""
     try:
         # Check duplicate
-        existing = supabase.table("folders_table").select("id").eq("owner_email", user_email).eq("name", name).execute()
-        if existing.data: return False, None
+        if get_data_layer().run(q_folder_by_name(name, user_email)): return False, None
         
         # Generate Key
         auto_key = generate_secure_key()
@@ -212,18 +226,28 @@ def create_folder(name, user_email):
             "owner_email": user_email, 
             "access_key": auto_key
         }).execute()
+        invalidate_workspace()
         return True, auto_key
     except Exception as e: return False, None
 
+def delete_job(job_id):
+    try:
+        supabase.table("jobs_table").delete().eq("id", job_id).execute()
+        invalidate_workspace()
+        return True
+    except: return False
+
 def delete_folder(folder_id):
     try:
         supabase.table("folders_table").delete().eq("id", folder_id).execute()
+        invalidate_workspace()
         return True
     except: return False
 
 def rename_folder_data(folder_id, new_name, new_key):
     try:
         supabase.table("folders_table").update({"name": new_name, "access_key": new_key}).eq("id", folder_id).execute()
+        invalidate_workspace()
         return True
     except: return False
 
@@ -231,128 +255,397 @@ def move_job_to_folder(job_id, folder_id):
     try:
         fid = folder_id if folder_id and folder_id > 0 else None
         supabase.table("jobs_table").update({"folder_id": fid}).eq("id", job_id).execute()
+        invalidate_workspace()
         return True
     except: return False
 
+# =============================================================================
+# WORKSPACE CACHE
+# =============================================================================
+# Writes from other worker processes / replicas can't invalidate this process's cache,
+# so entries are also rebuilt once they are this old
+WORKSPACE_TTL_SECONDS = 30
+
+@st.cache_resource
+def _workspace_store():
+    # owner_email -> workspace, shared by every session of that owner
+    return {}
+
+def invalidate_workspace(user_email=None):
+    _workspace_store().pop(user_email or st.session_state.get('user_email'), None)
+
+def get_workspace(user_email):
+    """Jobs, folders, search index and jobs-by-folder grouping, built once and
+    reused across reruns until a job or folder write invalidates it or the TTL expires.
+    If either query fails, the last good workspace (or a partial one) is served without
+    being cached, and the next rerun retries."""
+    store = _workspace_store()
+    ws = store.get(user_email)
+    if ws is None or pytime.time() - ws["loaded_at"] > WORKSPACE_TTL_SECONDS:
+        jobs, folders = get_data_layer().gather(q_jobs(user_email), q_folders(user_email))
+        if not (isinstance(jobs, list) and isinstance(folders, list)):
+            if ws is not None: return ws
+            complete = False
+        else: complete = True
+        jobs = jobs if isinstance(jobs, list) else []; folders = folders if isinstance(folders, list) else []
+        by_folder = {}
+        for j in jobs: by_folder.setdefault(j.get('folder_id') or 0, []).append(j)
+        ws = {"jobs": jobs, "folders": folders, "jobs_by_folder": by_folder, "index": SearchIndex(jobs, folders), "loaded_at": pytime.time()}
+        if complete: store[user_email] = ws
+    return ws
+
+# =============================================================================
+# WORKER POOL & ADMISSION CONTROL
+# =============================================================================
+PRIORITY_PREVIEW = 0   # interactive previews / page loads
+PRIORITY_BATCH = 1     # exports, ingestion
+
+class WorkPool:
+    """Server-wide bounded pools shared by every session.
+    'cpu' = parsing / xlsx serialization in worker processes (functions from mro_workers),
+    'io' = Supabase transfers in threads.
+    Each user has at most per_user[kind] jobs in flight per pool (the rest wait in line),
+    and waiting jobs are admitted by priority then arrival order."""
+    def __init__(self, cpu_workers, io_workers, per_user=None):
+        self.sizes = {"cpu": cpu_workers, "io": io_workers}
+        self.pools = {"cpu": self._process_pool(cpu_workers), "io": ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="mro-io")}
+        self.free = dict(self.sizes)
+        self.waiting = {k: [] for k in self.sizes}   # heaps of (priority, seq, user)
+        self.per_user = per_user or {"cpu": 1, "io": 1}
+        self.busy_users = {k: {} for k in self.sizes}   # user -> jobs in flight
+        self.cond = threading.Condition()
+        self.seq = itertools.count()
+        self.stats = {k: {"admitted": 0, "done": 0, "wait_total": 0.0, "wait_max": 0.0} for k in self.sizes}
+
+    @staticmethod
+    def _process_pool(workers):
+        # spawn: forking the threaded Streamlit server is unsafe
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _next_admissible(self, kind):
+        for entry in sorted(self.waiting[kind]):
+            if self.busy_users[kind].get(entry[2], 0) < self.per_user[kind]: return entry
+        return None
+
+    def _release(self, kind, user):
+        with self.cond:
+            self.free[kind] += 1
+            busy = self.busy_users[kind]
+            busy[user] -= 1
+            if not busy[user]: del busy[user]
+            self.stats[kind]["done"] += 1
+            self.cond.notify_all()
+
+    def submit(self, kind, user, priority, fn, *args, **kwargs):
+        """Blocks the caller until admitted, then returns the pool Future for fn."""
+        entry = (priority, next(self.seq), user)
+        t0 = pytime.time()
+        with self.cond:
+            heapq.heappush(self.waiting[kind], entry)
+            while not (self.free[kind] > 0 and self._next_admissible(kind) == entry): self.cond.wait()
+            self.waiting[kind].remove(entry); heapq.heapify(self.waiting[kind])
+            self.free[kind] -= 1; self.busy_users[kind][user] = self.busy_users[kind].get(user, 0) + 1
+            waited = pytime.time() - t0
+            st_k = self.stats[kind]
+            st_k["admitted"] += 1; st_k["wait_total"] += waited; st_k["wait_max"] = max(st_k["wait_max"], waited)
+        try:
+            if kind == "cpu":
+                try: future = self.pools["cpu"].submit(fn, *args, **kwargs)
+                except BrokenProcessPool:
+                    # A worker died (e.g. OOM); start a fresh pool and retry once
+                    self.pools["cpu"] = self._process_pool(self.sizes["cpu"])
+                    future = self.pools["cpu"].submit(fn, *args, **kwargs)
+            else:
+                ctx = get_script_run_ctx()
+                def task():
+                    # Lets st.progress / st.cache_data work from the pool thread
+                    if ctx is not None: add_script_run_ctx(threading.current_thread(), ctx)
+                    return fn(*args, **kwargs)
+                future = self.pools["io"].submit(task)
+        except Exception:
+            self._release(kind, user); raise
+        future.add_done_callback(lambda _: self._release(kind, user))
+        return future
+
+    def run(self, kind, user, priority, fn, *args, **kwargs):
+        """Blocks the caller until admitted, runs fn in the pool and returns its result."""
+        return self.submit(kind, user, priority, fn, *args, **kwargs).result()
+
+    def metrics(self):
+        with self.cond:
+            return {k: {
+                "queued": len(self.waiting[k]), "running": self.sizes[k] - self.free[k], "done": s["done"],
+                "avg_wait": (s["wait_total"] / s["admitted"]) if s["admitted"] else 0.0, "max_wait": s["wait_max"],
+            } for k, s in self.stats.items()}
+
+@st.cache_resource
+def get_work_pool():
+    cpu = os.cpu_count() or 2
+    # Each CPU worker is a process holding its own copy of the frame it works on
+    return WorkPool(cpu_workers=max(1, min(cpu - 1, 4)), io_workers=cpu * 4, per_user={"cpu": 1, "io": SYNC_WORKERS})
+
+def run_heavy(kind, priority, fn, *args, **kwargs):
+    """Runs a heavy call through the shared pool on behalf of the current user."""
+    user = st.session_state.get('user_email', 'anonymous')
+    return get_work_pool().run(kind, user, priority, fn, *args, **kwargs)
+
 # =============================================================================
 # EXPORT ENGINE & DATA PROCESSING
 # =============================================================================
 @st.cache_data
 def load_data(uploaded_file):
     if uploaded_file is None: return None
-    try:
-        if uploaded_file.name.endswith('.csv'): df = pd.read_csv(uploaded_file, dtype=str, keep_default_na=False)
-        else: df = pd.read_excel(uploaded_file, dtype=str, keep_default_na=False)
-        for col in df.columns:
-            if 'date' in col.lower(): df[col] = pd.to_datetime(df[col], errors='coerce', dayfirst=True)
-            else:
-                try: df[col] = pd.to_numeric(df[col], errors='ignore')
-                except: pass
-        return df.fillna("")
+    try: return run_heavy("cpu", PRIORITY_BATCH, parse_upload, uploaded_file.name, uploaded_file.getvalue())
     except: return None
 
-def filter_date(df, date_col, days):
-    if days == 0 or not days or date_col not in df.columns: return df
+DELIVERY_MODES = ["Full export", "Changes only"]
+
+def load_report_fingerprint(job_id):
     try:
-        temp_df = df.copy()
-        temp_df[date_col] = pd.to_datetime(temp_df[date_col], dayfirst=True, errors='coerce')
-        cutoff = datetime.now() - timedelta(days=days)
-        return df.loc[temp_df[temp_df[date_col] >= cutoff].index]
-    except: return df
-
-def process_report_dataframe(df_raw, job_config):
-    """Processes filters and returns a CLEAN DATAFRAME"""
+        db = get_data_layer()
+        res = db.run(db.select("report_fingerprints", columns="fingerprint", filters=[("job_id", "eq", job_id)]))
+        return res[0]['fingerprint'] if res else None
+    except: return None
+
+def mark_report_delivered(job_id, fingerprint):
+    """Makes fingerprint the baseline for the job's next change-only delivery."""
+    if fingerprint is None: return False
     try:
-        df = df_raw.copy()
-        filters = job_config.get('filters_config', {})
-        if filters is None: filters = {}
-        
-        # 1. Master Filters
-        for col, selected_vals in filters.items():
-            if col not in ["retention_days", "date_column", "display_columns", "custom_code"] and col in df.columns:
-                if isinstance(selected_vals, list):
-                    if selected_vals: df = df[df[col].astype(str).isin(selected_vals)]
-                else:
-                    if selected_vals and selected_vals != "ALL": df = df[df[col].astype(str) == selected_vals]
-
-        # 2. Date
-        days = filters.get("retention_days", 0)
-        date_col = filters.get("date_column")
-        if days and days > 0 and date_col and date_col in df.columns:
-             df = filter_date(df, date_col, days)
-             
-        # 3. Code
-        code = filters.get("custom_code")
-        if code:
-            try: df = df.query(code)
-            except: pass
-            
-        # 4. Columns
-        cols = filters.get("display_columns")
-        if cols:
-            valid_cols = [c for c in cols if c in df.columns]
-            if valid_cols: df = df[valid_cols]
-            
-        return df
-    except Exception as e:
-        return None
+        supabase.table("report_fingerprints").upsert({"job_id": job_id, "fingerprint": fingerprint, "updated_at": datetime.utcnow().isoformat() + "Z"}).execute()
+        return True
+    except: return False
 
-def generate_report_file(df_raw, job_config):
+def reset_report_fingerprint(job_id):
     try:
-        df = process_report_dataframe(df_raw, job_config)
-        if df is None: return None, "Error processing data", None
-        
-        fmt = job_config.get('format', 'Excel (.xlsx)')
-        output = io.BytesIO()
-        
-        if "CSV" in fmt:
-            df.to_csv(output, index=False)
-            mime = "text/csv"; ext = ".csv"
-        else:
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                df.to_excel(writer, index=False, sheet_name='Report')
-            mime = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"; ext = ".xlsx"
-            
-        output.seek(0)
-        return output, mime, ext
-    except Exception as e:
-        return None, str(e), None
+        supabase.table("report_fingerprints").delete().eq("job_id", job_id).execute()
+        return True
+    except: return False
+
+def write_report_in_pool(df, fmt):
+    """Serializes an already-filtered report in the cpu pool. A pool failure (dead worker,
+    pickling error) comes back as (None, err, None) like generate_report_file did."""
+    try: return run_heavy("cpu", PRIORITY_BATCH, write_report_file, df, fmt)
+    except Exception as e: return None, str(e), None
+
+def generate_delivery_file(df_raw, job_config, full=False):
+    """Export honouring the job's delivery mode. 'Changes only' jobs get a delta against their
+    last delivery (matched on the job's delivery_key column if set), or a full export without a baseline.
+    Returns (output, mime, ext, fingerprint). Nothing is recorded here: pass the fingerprint
+    to mark_report_delivered once the file has actually been delivered."""
+    # Filtering stays in-process; only the filtered frame is shipped to the cpu pool
+    df = process_report_dataframe(df_raw, job_config)
+    if df is None: return None, "Error processing data", None, None
+    fmt = job_config.get('format', 'Excel (.xlsx)')
+    if full or job_config.get('delivery_mode') != "Changes only": return (*write_report_in_pool(df, fmt), None)
+    previous = load_report_fingerprint(job_config['id'])
+    try: return run_heavy("cpu", PRIORITY_BATCH, build_delivery_file, df, fmt, previous, job_config.get('delivery_key'))
+    except Exception as e: return None, str(e), None, None
 
 # =============================================================================
 # DATA STORAGE HELPERS
 # =============================================================================
+SYNC_WORKERS = 4
+SYNC_CHUNK_MIN, SYNC_CHUNK_START, SYNC_CHUNK_MAX = 500, 2000, 10000
+SYNC_TARGET_SECONDS = 2.0
+SYNC_RETRIES = 4
+# Replaced versions stay readable this long before their rows are deleted
+RAW_DATA_RETIRE_GRACE_SECONDS = 600
+
+def _insert_chunk_with_retry(rows):
+    """Inserts one chunk, retrying with exponential backoff. Returns (elapsed, attempts).
+    A retried insert may duplicate rows the server already committed; save_imported_data
+    catches that with a row count before the version goes live."""
+    for attempt in range(SYNC_RETRIES):
+        t0 = pytime.time()
+        try:
+            supabase.table("raw_data_table").insert(rows).execute()
+            return pytime.time() - t0, attempt + 1
+        except Exception:
+            if attempt == SYNC_RETRIES - 1: raise
+            pytime.sleep(0.5 * (2 ** attempt))
+
+def _delete_raw_rows(data_key):
+    supabase.table("raw_data_table").delete().eq("owner_email", data_key).execute()
+
+def _live_data_key(owner_email):
+    """Key under which the owner's live rows are stored. raw_data_versions points at the
+    version written by the last successful sync; owners without a pointer row still
+    have their rows under their own email. Raises if the lookup itself fails, since
+    guessing the legacy key there would read (or retire) the wrong dataset."""
+    db = get_data_layer()
+    res = db.run(db.select("raw_data_versions", columns="live_key", filters=[("owner_email", "eq", owner_email)]))
+    return res[0]['live_key'] if res else owner_email
+
+def _purge_retired_data(db):
+    """Deletes the rows of versions retired more than the grace period ago."""
+    cutoff = datetime.utcfromtimestamp(pytime.time() - RAW_DATA_RETIRE_GRACE_SECONDS).isoformat() + "Z"
+    for row in db.run(db.select("raw_data_retired", columns="data_key", filters=[("retired_at", "lt", cutoff)])):
+        _delete_raw_rows(row['data_key'])
+        supabase.table("raw_data_retired").delete().eq("data_key", row['data_key']).execute()
+
+def _retire_data_key(data_key, user_email, pool):
+    """Schedules a replaced version for deletion after the grace period, so loads that
+    resolved the old key before the swap can finish paging it. The raw_data_retired row
+    lets a later sync purge it if this process is gone by then."""
+    db = get_data_layer()
+    try:
+        supabase.table("raw_data_retired").upsert({"data_key": data_key, "retired_at": datetime.utcnow().isoformat() + "Z"}).execute()
+        task, args = _purge_retired_data, (db,)
+    except:
+        # Not recorded: this process is the only one that knows, so delete it directly
+        task, args = _delete_raw_rows, (data_key,)
+    timer = threading.Timer(RAW_DATA_RETIRE_GRACE_SECONDS + 1, pool.submit, args=("io", user_email, PRIORITY_BATCH, task, *args))
+    timer.daemon = True
+    timer.start()
+    # Also clears versions retired by earlier syncs whose process didn't live to purge them
+    pool.submit("io", user_email, PRIORITY_BATCH, _purge_retired_data, db)
+
 def save_imported_data(df, user_email):
+    """Streams the frame into a new data version with concurrent, adaptively sized chunks
+    (sent through the shared io pool), checks the row count, then repoints
+    raw_data_versions at it in one upsert. On failure the live dataset is left untouched."""
+    try: previous_key = _live_data_key(user_email)
+    except: return False   # unknown live version: nothing safe to retire afterwards
+    version_key = f"{user_email}#v-{secrets.token_hex(6)}"
+    pool = get_work_pool()
+    progress = st.progress(0, text="Syncing...")
     try:
-        supabase.table("raw_data_table").delete().eq("owner_email", user_email).execute()
         df_save = df.copy()
         for col in df_save.columns:
             if pd.api.types.is_datetime64_any_dtype(df_save[col]): df_save[col] = df_save[col].dt.strftime('%Y-%m-%d %H:%M:%S')
-        df_save = df_save.where(pd.notnull(df_save), None)
-        all_rows = [{"owner_email": user_email, "row_data": row} for row in df_save.to_dict(orient='records')]
-        chunk_size = 5000
-        total = len(all_rows)
-        progress = st.progress(0, text="Syncing...")
-        for i in range(0, total, chunk_size):
-            chunk = all_rows[i : i + chunk_size]
-            supabase.table("raw_data_table").insert(chunk).execute()
-            progress.progress(min((i + chunk_size) / total, 1.0))
+        df_save = df_save.astype(object).where(pd.notnull(df_save), None)
+        total = len(df_save)
+        chunk_size = SYNC_CHUNK_START; pos = 0; sent = 0; in_flight = {}
+        try:
+            while pos < total or in_flight:
+                while pos < total and len(in_flight) < SYNC_WORKERS:
+                    # Records are only materialised one chunk at a time
+                    rows = [{"owner_email": version_key, "row_data": r} for r in df_save.iloc[pos : pos + chunk_size].to_dict(orient='records')]
+                    in_flight[pool.submit("io", user_email, PRIORITY_BATCH, _insert_chunk_with_retry, rows)] = len(rows)
+                    pos += len(rows)
+                done = next(as_completed(in_flight))
+                n = in_flight.pop(done)
+                elapsed, attempts = done.result()
+                # Grow while chunks come back fast, shrink on slow or retried ones
+                if attempts > 1 or elapsed > SYNC_TARGET_SECONDS * 2: chunk_size = max(SYNC_CHUNK_MIN, chunk_size // 2)
+                elif elapsed < SYNC_TARGET_SECONDS / 2: chunk_size = min(SYNC_CHUNK_MAX, chunk_size * 2)
+                sent += n
+                progress.progress(min(sent / total, 1.0))
+        finally:
+            for future in in_flight: future.cancel()
+            wait(in_flight)
+        if total:
+            db = get_data_layer()
+            _, stored = db.run(db.select("raw_data_table", columns="id", filters=[("owner_email", "eq", version_key)], rows=(0, 0), count=True))
+            if stored != total: raise ValueError(f"row count mismatch: {stored} stored, {total} sent")
+        supabase.table("raw_data_versions").upsert({"owner_email": user_email, "live_key": version_key, "updated_at": datetime.utcnow().isoformat() + "Z"}).execute()
+    except:
         progress.empty()
-        return True
-    except: return False
+        try: _delete_raw_rows(version_key)
+        except: pass
+        return False
+
+    # The new version is live from here on; nothing below can fail the sync
+    progress.empty()
+    store = get_snapshot_store()
+    if store: store.put(user_email, version_key, df_save)
+    if previous_key != version_key:
+        try: _retire_data_key(previous_key, user_email, pool)
+        except: pass
+    return True
 
 def load_stored_data(target_email):
+    # Each sync writes under a fresh key, so the live key doubles as the snapshot version
+    try: data_key = _live_data_key(target_email)
+    except: return None
+    store = get_snapshot_store()
+    if store:
+        df = store.get(target_email, data_key)
+        if df is not None: return df
     try:
-        all_data = []
-        start = 0
-        while True:
-            res = supabase.table("raw_data_table").select("row_data").eq("owner_email", target_email).range(start, start + 9999).execute()
-            if not res.data: break
-            all_data.extend([item['row_data'] for item in res.data])
-            if len(res.data) < 10000: break
-            start += 10000
-        return pd.DataFrame(all_data) if all_data else None
+        db = get_data_layer()
+        rows = db.run(db.select_all("raw_data_table", columns="row_data", filters=[("owner_email", "eq", data_key)], order="id", timeout=60.0), timeout=None)
+        all_data = [item['row_data'] for item in rows]
+        df = pd.DataFrame(all_data) if all_data else None
+        if df is not None and store: store.put(target_email, data_key, df)
+        return df
     except: return None
 
+# =============================================================================
+# SHARED SNAPSHOT STORE
+# =============================================================================
+SNAPSHOT_DIR = os.environ.get("MRO_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), f"mro_snapshots-{os.getuid() if hasattr(os, 'getuid') else 'app'}"))
+SNAPSHOT_QUOTA_BYTES = int(os.environ.get("MRO_SNAPSHOT_QUOTA_MB", "2048")) * 1024 * 1024
+
+class SnapshotStore:
+    """Node-local Feather files, one per owner and data version, readable by every
+    worker process on the node (private to the app's OS user: dir 0700, files 0600).
+    Files are uncompressed and memory-mapped on read: numeric columns without nulls come
+    back as views of the mapping, string columns are still materialised as Python objects.
+    The least recently accessed files are evicted once the disk quota is exceeded."""
+    def __init__(self, root, quota_bytes):
+        self.root = root; self.quota = quota_bytes
+        os.makedirs(root, mode=0o700, exist_ok=True)
+        if os.path.islink(root): raise OSError(f"{root} is a symlink")
+        if hasattr(os, "getuid") and os.stat(root).st_uid != os.getuid(): raise OSError(f"{root} is owned by another user")
+        os.chmod(root, 0o700)
+
+    def _prefix(self, owner):
+        return hashlib.sha256(owner.encode()).hexdigest()[:16]
+
+    def _path(self, owner, version):
+        version_hash = hashlib.sha256(version.encode()).hexdigest()[:16]
+        return os.path.join(self.root, f"{self._prefix(owner)}-{version_hash}.feather")
+
+    def get(self, owner, version):
+        path = self._path(owner, version)
+        try:
+            df = feather.read_table(path, memory_map=True).to_pandas(split_blocks=True, self_destruct=True)
+            os.utime(path)   # mtime doubles as last access for eviction
+            return df
+        except Exception: return None
+
+    def put(self, owner, version, df):
+        path = self._path(owner, version)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb") as out:
+                feather.write_feather(df.reset_index(drop=True), out, compression="uncompressed")
+            os.replace(tmp, path)
+        except Exception:
+            try: os.remove(tmp)
+            except OSError: pass
+            return False
+        prefix = self._prefix(owner) + "-"
+        try:
+            for name in os.listdir(self.root):
+                if name.startswith(prefix) and name.endswith(".feather") and os.path.join(self.root, name) != path:
+                    try: os.remove(os.path.join(self.root, name))
+                    except OSError: pass
+            self.evict()
+        except OSError: pass
+        return True
+
+    def evict(self):
+        files = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".feather"): continue
+            try:
+                stat = os.stat(os.path.join(self.root, name))
+                files.append((stat.st_mtime, stat.st_size, name))
+            except OSError: pass
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.quota: break
+            try: os.remove(os.path.join(self.root, name)); total -= size
+            except OSError: pass
+
+@st.cache_resource
+def get_snapshot_store():
+    if feather is None: return None
+    try: return SnapshotStore(SNAPSHOT_DIR, SNAPSHOT_QUOTA_BYTES)
+    except OSError: return None
+
 # =============================================================================
 # MAIN APPLICATION
 # =============================================================================
@@ -382,6 +675,11 @@ def run_mro_app():
         
         if user_role != 'viewer' and st.session_state['edit_mode']:
             st.warning("✏️ **EDIT MODE ACTIVE**")
+
+        if user_role == 'admin':
+            with st.expander("⚙️ Worker Pool", expanded=False):
+                for kind, m in get_work_pool().metrics().items():
+                    st.caption(f"**{kind.upper()}** · running {m['running']} · queued {m['queued']} · done {m['done']} · wait avg {m['avg_wait']:.2f}s / max {m['max_wait']:.2f}s")
             
         if st.button("Logout", type="primary"):
             st.session_state['logged_in'] = False
@@ -400,14 +698,17 @@ def run_mro_app():
         df_raw = None
         if uploaded_file is not None:
             df_raw = load_data(uploaded_file)
-            if df_raw is not None:
-                save_imported_data(df_raw, st.session_state['user_email'])
-                st.session_state['df_persistent'] = df_raw
-                st.success(f"✅ Data synchronized: {len(df_raw)} rows.")
+            upload_id = getattr(uploaded_file, 'file_id', uploaded_file.name)
+            if df_raw is not None and st.session_state.get('synced_upload_id') != upload_id:
+                if save_imported_data(df_raw, st.session_state['user_email']):
+                    st.session_state['synced_upload_id'] = upload_id
+                    st.session_state['df_persistent'] = df_raw
+                    st.success(f"✅ Data synchronized: {len(df_raw)} rows.")
+                else: st.error("❌ Sync failed. Your previously saved data is unchanged.")
         else:
             if 'df_persistent' not in st.session_state or st.session_state['df_persistent'] is None:
                 with st.spinner("🔄 Retrieving saved data..."):
-                    st.session_state['df_persistent'] = load_stored_data(st.session_state['user_email'])
+                    st.session_state['df_persistent'] = run_heavy("io", PRIORITY_PREVIEW, load_stored_data, st.session_state['user_email'])
             df_raw = st.session_state['df_persistent']
 
         if df_raw is None:
@@ -503,7 +804,8 @@ def run_mro_app():
 
         # --- SCHEDULE & EDIT ---
         elif st.session_state['current_view'] == "Schedule & Edit":
-            folders = get_folders(st.session_state['user_email'])
+            ws = get_workspace(st.session_state['user_email'])
+            folders = ws['folders']
             folder_options = {0: "📂 No Folder"} 
             for f in folders: folder_options[f['id']] = f"📁 {f['name']}"
 
@@ -523,10 +825,11 @@ def run_mro_app():
                         def_days = [d.strip() for d in old_days_part.split(',')]; idx_rec = ["Every week", "Every 2 weeks", "Every 4 weeks"].index(old_rec_part)
                     except: def_days = ["Monday"]; idx_rec = 0
                     def_fid = edit_data.get('folder_id', 0)
+                    def_delivery = edit_data.get('delivery_mode') or DELIVERY_MODES[0]; def_key = edit_data.get('delivery_key') or ""
                     current_saved_filters = edit_data.get('filters_config', {})
                 else:
                     st.subheader("🚀 New Report")
-                    def_name = ""; def_recip = ""; def_subj = ""; def_msg = ""; def_hour = time(8, 0); def_days = ["Monday"]; idx_rec = 0; def_fid = 0; current_saved_filters = {}
+                    def_name = ""; def_recip = ""; def_subj = ""; def_msg = ""; def_hour = time(8, 0); def_days = ["Monday"]; idx_rec = 0; def_fid = 0; current_saved_filters = {}; def_delivery = DELIVERY_MODES[0]; def_key = ""
 
                 active_visu_filters = st.session_state.get('active_filters', {})
                 if 'form_filters' not in st.session_state: st.session_state['form_filters'] = current_saved_filters
@@ -557,6 +860,11 @@ def run_mro_app():
                     c_time, c_fmt = st.columns(2)
                     send_time = c_time.time_input("Time", value=def_hour)
                     fmt = c_fmt.selectbox("Format", ["Excel (.xlsx)", "CSV"])
+                    c_mode, c_key = st.columns(2)
+                    delivery = c_mode.selectbox("Delivery", DELIVERY_MODES, index=DELIVERY_MODES.index(def_delivery) if def_delivery in DELIVERY_MODES else 0, help="'Changes only' sends added / changed / removed rows since the last delivery.")
+                    key_options = [""] + [str(c) for c in df_raw.columns] if df_raw is not None else [""]
+                    if def_key not in key_options: key_options.append(def_key)
+                    delivery_key = c_key.selectbox("Change Key", key_options, index=key_options.index(def_key), format_func=lambda x: x or "None (compare whole rows)", help="Unique column (e.g. work order) used to match rows between deliveries. Without one, edited rows show as removed + added.")
                     
                     if st.form_submit_button("💾 Save/Update", use_container_width=True):
                         if job_name and recipients and selected_days:
@@ -569,22 +877,31 @@ def run_mro_app():
                                     "frequency": freq, "hour": str(send_time), "format": fmt, "folder_id": initial_folder if initial_folder > 0 else None,
                                     "filters_config": st.session_state.get('form_filters', {})
                                 }
+                                # Only sent when used, so databases without the column keep working
+                                if delivery != DELIVERY_MODES[0] or def_delivery != DELIVERY_MODES[0]: payload["delivery_mode"] = delivery
+                                if delivery_key or def_key: payload["delivery_key"] = delivery_key or None
                                 if not st.session_state['edit_mode']:
                                     payload.update({"owner_email": st.session_state['user_email'], "active": False})
                                     nid = add_job(payload)
                                     if nid: st.success("Saved!"); st.session_state['form_filters'] = {}; st.session_state['last_updated_id'] = nid; st.session_state['last_updated_time'] = pytime.time(); st.rerun()
+                                    else: st.error("Save failed.")
                                 else:
                                     if update_job(st.session_state['edit_job_id'], payload):
+                                        # A new configuration starts a fresh change baseline
+                                        if "delivery_mode" in payload or "delivery_key" in payload: reset_report_fingerprint(st.session_state['edit_job_id'])
                                         st.success("Updated!"); st.session_state['last_updated_id'] = st.session_state['edit_job_id']; st.session_state['last_updated_time'] = pytime.time()
                                         st.session_state['edit_mode'] = False; st.session_state['edit_job_id'] = None; st.session_state['form_filters'] = {}; st.rerun()
+                                    else: st.error("Update failed.")
                         else: st.error("Fill mandatory fields.")
 
             with col_list:
                 c_head, c_search = st.columns([1, 1])
                 with c_head: st.subheader("📋 Scheduled")
                 with c_search: search_sched = st.text_input("🔍 Search reports", label_visibility="collapsed")
-                my_jobs = load_jobs(st.session_state['user_email'])
-                if search_sched: my_jobs = [j for j in my_jobs if search_sched.lower() in j['task_name'].lower()]
+                my_jobs = ws['jobs']
+                if search_sched:
+                    hits = ws['index'].search(search_sched)
+                    if hits is not None: my_jobs = [j for j in my_jobs if ("job", j['id']) in hits]
 
                 if not my_jobs: st.info("No reports.")
                 for job in my_jobs:
@@ -602,21 +919,31 @@ def run_mro_app():
                             st.markdown(f"<div class='small-text'>{folder_label} | {job['frequency']} @ {job['hour']}<br>📧 {job['recipient']}</div>", unsafe_allow_html=True)
                         with c_btns:
                             if st.button("⏸️" if is_active else "▶️", key=f"tog_{target_id}", use_container_width=True):
-                                supabase.table("jobs_table").update({"active": not is_active}).eq("id", target_id).execute(); st.rerun()
-                            b_edit, b_exp, b_del = st.columns(3)
+                                update_job(target_id, {"active": not is_active}); st.rerun()
+                            changes_only = job.get('delivery_mode') == "Changes only"
+                            if changes_only: b_edit, b_exp, b_full, b_del = st.columns(4)
+                            else: b_edit, b_exp, b_del = st.columns(3)
                             with b_edit:
                                 if st.button("✏️", key=f"edt_{target_id}", disabled=is_active):
-                                    st.session_state['edit_mode'] = True; st.session_state['edit_job_id'] = target_id; st.session_state['edit_job_data'] = job
+                                    st.session_state['edit_mode'] = True; st.session_state['edit_job_id'] = target_id; st.session_state['edit_job_data'] = dict(job)
                                     st.session_state['form_filters'] = job.get('filters_config', {}); st.rerun()
                             with b_exp:
                                 if st.button("⚡", key=f"prepexp_{target_id}", help="Export"):
                                     with st.spinner("."):
-                                        fd, m, e = generate_report_file(df_raw, job)
-                                        if fd: st.download_button("⬇️", data=fd, file_name=f"{job['task_name']}{e}", mime=m, key=f"dl_{target_id}")
+                                        fd, m, e, fp = generate_delivery_file(df_raw, job)
+                                        # The change baseline only moves when the file is downloaded
+                                        if fd: st.download_button("⬇️", data=fd, file_name=f"{job['task_name']}{e}", mime=m, key=f"dl_{target_id}", on_click=mark_report_delivered, args=(target_id, fp))
                                         else: st.error("Err")
+                            if changes_only:
+                                with b_full:
+                                    if st.button("📦", key=f"prepfull_{target_id}", help="Full export"):
+                                        with st.spinner("."):
+                                            fd, m, e, _ = generate_delivery_file(df_raw, job, full=True)
+                                            if fd: st.download_button("⬇️", data=fd, file_name=f"{job['task_name']}{e}", mime=m, key=f"dlfull_{target_id}")
+                                            else: st.error("Err")
                             with b_del:
                                 with st.popover("🗑️", disabled=is_active):
-                                    if st.button("YES", key=f"conf_del_{target_id}", type="primary"): supabase.table("jobs_table").delete().eq("id", target_id).execute(); st.rerun()
+                                    if st.button("YES", key=f"conf_del_{target_id}", type="primary"): delete_job(target_id); st.rerun()
                         st.divider()
 
         # --- FOLDERS (AUTOMATIC KEY) ---
@@ -643,19 +970,18 @@ def run_mro_app():
                             else: st.error("Exists already!")
             
             st.markdown("---")
-            all_folders = get_folders(st.session_state['user_email']); all_jobs = load_jobs(st.session_state['user_email'])
-            if search_query:
-                q = search_query.lower(); filtered_folders = []
-                for f in all_folders:
-                    jobs_in = [j for j in all_jobs if j.get('folder_id') == f['id']]
-                    if q in f['name'].lower() or any(q in j['task_name'].lower() for j in jobs_in): filtered_folders.append(f)
+            ws = get_workspace(st.session_state['user_email'])
+            all_folders = ws['folders']; jobs_by_folder = ws['jobs_by_folder']
+            hits = ws['index'].search(search_query) if search_query else None
+            if hits is not None:
+                filtered_folders = [f for f in all_folders if ("folder", f['id']) in hits or any(("job", j['id']) in hits for j in jobs_by_folder.get(f['id'], []))]
             else: filtered_folders = all_folders
 
             if not filtered_folders: st.info("No folders.")
             for folder in filtered_folders:
                 fid = folder['id']; fname = folder['name']
-                jobs_in = [j for j in all_jobs if j.get('folder_id') == fid]
-                if search_query: jobs_in = [j for j in jobs_in if search_query.lower() in j['task_name'].lower()]
+                jobs_in = jobs_by_folder.get(fid, [])
+                if hits is not None: jobs_in = [j for j in jobs_in if ("job", j['id']) in hits]
                 
                 with st.expander(f"📁 **{fname}** ({len(jobs_in)})", expanded=(True if search_query else False)):
                     c_ren, c_rkey, c_btn, c_del_f = st.columns([2, 1, 1, 1])
@@ -675,16 +1001,16 @@ def run_mro_app():
                         c1.markdown(f"📄 **{j['task_name']}**")
                         with c2:
                             if st.button("✏️", key=f"f_ed_{jid}"):
-                                st.session_state['edit_mode'] = True; st.session_state['edit_job_id'] = jid; st.session_state['edit_job_data'] = j
+                                st.session_state['edit_mode'] = True; st.session_state['edit_job_id'] = jid; st.session_state['edit_job_data'] = dict(j)
                                 st.session_state['form_filters'] = j.get('filters_config', {}); st.session_state['current_view'] = "Schedule & Edit"; st.rerun()
                         with c3:
                             if st.button("⚡", key=f"f_ex_{jid}"):
                                 with st.spinner("."):
-                                    fd, m, e = generate_report_file(df_raw, j)
-                                    if fd: st.download_button("⬇️", data=fd, file_name=f"{j['task_name']}{e}", mime=m, key=f"f_dl_{jid}")
+                                    fd, m, e, fp = generate_delivery_file(df_raw, j)
+                                    if fd: st.download_button("⬇️", data=fd, file_name=f"{j['task_name']}{e}", mime=m, key=f"f_dl_{jid}", on_click=mark_report_delivered, args=(jid, fp))
 
             if not search_query:
-                orphans = [j for j in all_jobs if not j.get('folder_id') or j.get('folder_id') == 0]
+                orphans = jobs_by_folder.get(0, [])
                 if orphans:
                     st.markdown("### 📂 Uncategorized"); 
                     for j in orphans: st.markdown(f"📄 **{j['task_name']}**")
@@ -718,14 +1044,15 @@ def run_mro_app():
             selected_folder_name = st.selectbox("📁 Select Folder", [f['name'] for f in my_folders])
             selected_folder_id = next(f['id'] for f in my_folders if f['name'] == selected_folder_name)
             
-            folder_owner_res = supabase.table("folders_table").select("owner_email").eq("id", selected_folder_id).execute()
-            if folder_owner_res.data:
-                owner_email = folder_owner_res.data[0]['owner_email']
+            folder_owner, folder_jobs = get_data_layer().gather(q_folder_owner(selected_folder_id), q_folder_jobs(selected_folder_id))
+            if isinstance(folder_jobs, Exception): folder_jobs = []
+            if isinstance(folder_owner, Exception): st.error("Data source unavailable.")
+            elif folder_owner:
+                owner_email = folder_owner[0]['owner_email']
                 with st.spinner("Loading secure data..."):
-                    df_owner_raw = load_stored_data(owner_email)
+                    df_owner_raw = run_heavy("io", PRIORITY_PREVIEW, load_stored_data, owner_email)
                 
                 if df_owner_raw is not None:
-                    folder_jobs = load_folder_jobs(selected_folder_id)
                     if not folder_jobs: st.warning("No active reports in this folder.")
                     else:
                         selected_job_name = st.selectbox("📄 Select Report", [j['task_name'] for j in folder_jobs])
@@ -734,7 +1061,7 @@ def run_mro_app():
                         df_viewer = process_report_dataframe(df_owner_raw, selected_job)
                         if df_viewer is not None:
                              st.dataframe(df_viewer, use_container_width=True, height=600)
-                             fd, m, e = generate_report_file(df_owner_raw, selected_job)
+                             fd, m, e = write_report_in_pool(df_viewer, selected_job.get('format', 'Excel (.xlsx)'))
                              if fd: st.download_button("⬇️ Download Excel/CSV", data=fd, file_name=f"{selected_job['task_name']}{e}", mime=m)
                         else: st.error("Error processing this report configuration.")
                 else: st.error("Data source unavailable.")
@@ -0,0 +1,124 @@
+import asyncio
+import importlib.util
+import threading
+import httpx
+
+# =============================================================================
+# ASYNC DATA ACCESS (READS)
+# Kept free of Streamlit so the layer and its fake backend can be tested offline.
+# =============================================================================
+ASYNC_DEFAULT_TIMEOUT = 10.0
+
+class AsyncDataLayer:
+    """Read path to PostgREST over one pooled, keep-alive HTTP/2 client.
+    Coroutines run on a dedicated event loop thread so independent queries on a page
+    can be awaited together; the script thread just blocks on the combined result."""
+    def __init__(self, base_url, api_key, transport=None):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="mro-async", daemon=True).start()
+        self.client = httpx.AsyncClient(
+            # HTTP/2 needs the optional h2 package; without it the pool falls back to HTTP/1.1 keep-alive
+            base_url=f"{base_url.rstrip('/')}/rest/v1", http2=transport is None and importlib.util.find_spec("h2") is not None, transport=transport,
+            headers={"apikey": api_key, "Authorization": f"Bearer {api_key}"},
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=30.0),
+            timeout=ASYNC_DEFAULT_TIMEOUT,
+        )
+
+    def run(self, coro, timeout=ASYNC_DEFAULT_TIMEOUT):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try: return future.result(timeout)
+        except Exception: future.cancel(); raise
+
+    def gather(self, *coros, timeout=ASYNC_DEFAULT_TIMEOUT):
+        """Runs the queries concurrently. Never raises: a failed query yields its exception
+        instead of a result, and if the whole call times out every slot holds the timeout."""
+        async def _all(): return await asyncio.gather(*coros, return_exceptions=True)
+        try: return self.run(_all(), timeout)
+        except Exception as e: return [e] * len(coros)
+
+    @staticmethod
+    def _params(columns, filters, order):
+        params = [("select", columns)]
+        for col, op, val in filters or []:
+            if op == "in": val = "(" + ",".join(str(v) for v in val) + ")"
+            elif isinstance(val, bool): val = str(val).lower()
+            params.append((col, f"{op}.{val}"))
+        if order: params.append(("order", order))
+        return params
+
+    async def select(self, table, columns="*", filters=None, order=None, rows=None, count=False, timeout=None):
+        """filters: [(column, 'eq' | 'neq' | 'lt' | 'in', value)]; rows: (first, last) for a Range request.
+        Returns the row list, or (rows, total) when count=True."""
+        headers = {}
+        if rows: headers.update({"Range-Unit": "items", "Range": f"{rows[0]}-{rows[1]}"})
+        if count: headers["Prefer"] = "count=exact"
+        res = await self.client.get(f"/{table}", params=self._params(columns, filters, order), headers=headers, timeout=timeout or ASYNC_DEFAULT_TIMEOUT)
+        res.raise_for_status()
+        if not count: return res.json()
+        total = res.headers.get("content-range", "*/*").rsplit("/", 1)[-1]
+        return res.json(), (int(total) if total.isdigit() else None)
+
+    async def select_all(self, table, columns="*", filters=None, order=None, page=10000, parallel=4, timeout=None):
+        """Reads every matching row. The first page reports the total, the rest are fetched concurrently.
+        Raises ValueError if the pages don't add up to that total (rows changed mid-read)."""
+        kw = dict(columns=columns, filters=filters, order=order, timeout=timeout)
+        data, total = await self.select(table, rows=(0, page - 1), count=True, **kw)
+        if not data:
+            if total: raise ValueError(f"{table}: first page empty, {total} rows expected")
+            return data
+        step = len(data)   # the server may cap pages below the requested size
+        if total is None:
+            start = step
+            while True:
+                chunk = await self.select(table, rows=(start, start + step - 1), **kw)
+                data.extend(chunk); start += step
+                if len(chunk) < step: return data
+        sem = asyncio.Semaphore(parallel)
+        async def fetch(start):
+            async with sem: return await self.select(table, rows=(start, start + step - 1), **kw)
+        for chunk in await asyncio.gather(*(fetch(start) for start in range(step, total, step))): data.extend(chunk)
+        if len(data) != total: raise ValueError(f"{table}: read {len(data)} rows, {total} expected")
+        return data
+
+class FakePostgrest:
+    """In-memory PostgREST stand-in (eq / neq / lt / in filters, order, Range paging, exact count),
+    mounted as an httpx transport so the layer can be tested offline (see tests/test_mro_data.py).
+    Usage: AsyncDataLayer("http://fake", "key", transport=FakePostgrest({"jobs_table": [...]}).transport())"""
+    def __init__(self, tables=None):
+        self.tables = tables if tables is not None else {}
+
+    def transport(self):
+        return httpx.MockTransport(self.handle)
+
+    @staticmethod
+    def _text(v):
+        if v is None: return "null"
+        return str(v).lower() if isinstance(v, bool) else str(v)
+
+    def handle(self, request):
+        rows = list(self.tables.get(request.url.path.rsplit("/", 1)[-1], []))
+        columns = "*"; order = None
+        for col, cond in request.url.params.multi_items():
+            if col == "select": columns = cond; continue
+            if col == "order": order = cond; continue
+            op, _, val = cond.partition(".")
+            if op == "in":
+                allowed = set(val.strip("()").split(","))
+                rows = [r for r in rows if self._text(r.get(col)) in allowed]
+            elif op == "eq": rows = [r for r in rows if self._text(r.get(col)) == val]
+            elif op == "neq": rows = [r for r in rows if self._text(r.get(col)) != val]
+            elif op == "lt": rows = [r for r in rows if r.get(col) is not None and self._text(r.get(col)) < val]
+            else: return httpx.Response(400, json={"message": f"unsupported operator {op}"})
+        if order:
+            col, _, direction = order.partition(".")
+            rows.sort(key=lambda r: (r.get(col) is None, r.get(col)), reverse=(direction == "desc"))
+        if columns != "*":
+            keep = columns.split(",")
+            rows = [{c: r.get(c) for c in keep} for r in rows]
+        total = len(rows); first = 0
+        if "range" in request.headers:
+            first, _, last = request.headers["range"].partition("-")
+            first = int(first); rows = rows[first : int(last) + 1]
+        count = str(total) if "count=exact" in request.headers.get("prefer", "") else "*"
+        span = f"{first}-{first + len(rows) - 1}" if rows else "*"
+        return httpx.Response(200, json=rows, headers={"Content-Range": f"{span}/{count}"})
\ No newline at end of file
@@ -0,0 +1,55 @@
+import re
+import bisect
+import difflib
+
+# =============================================================================
+# SEARCH INDEX
+# Kept free of Streamlit so it can be tested offline.
+# =============================================================================
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+class SearchIndex:
+    """Inverted token index over reports (name, recipients, subject) and folder names.
+    Names are split on anything that isn't a letter or digit, so "B737-800" indexes
+    "b737" and "800". Every query term must match a token by prefix, or by fuzzy match
+    if no prefix hits; a plain substring match on the report / folder name (the old
+    search) always counts as a hit too."""
+    def __init__(self, jobs, folders):
+        self.postings = {}   # token -> {("job", id), ("folder", id)}
+        self.names = []      # (ref, lowercased name) for the substring fallback
+        for j in jobs:
+            self._add(("job", j['id']), j.get('task_name'), j.get('recipient'), j.get('email_subject'))
+            self.names.append((("job", j['id']), str(j.get('task_name') or "").lower()))
+        for f in folders:
+            self._add(("folder", f['id']), f.get('name'))
+            self.names.append((("folder", f['id']), str(f.get('name') or "").lower()))
+        self.tokens = sorted(self.postings)
+
+    @staticmethod
+    def tokenize(*texts):
+        return [t for x in texts if x for t in TOKEN_RE.findall(str(x).lower())]
+
+    def _add(self, ref, *texts):
+        for t in self.tokenize(*texts): self.postings.setdefault(t, set()).add(ref)
+
+    def _term_refs(self, term):
+        refs = set()
+        i = bisect.bisect_left(self.tokens, term)
+        while i < len(self.tokens) and self.tokens[i].startswith(term):
+            refs |= self.postings[self.tokens[i]]; i += 1
+        if not refs and len(term) > 2:
+            for t in difflib.get_close_matches(term, self.tokens, n=3, cutoff=0.8): refs |= self.postings[t]
+        return refs
+
+    def search(self, query):
+        """Returns the set of matching refs, or None for an empty query."""
+        q = str(query or "").strip().lower()
+        if not q: return None
+        result = None
+        for term in self.tokenize(q):
+            refs = self._term_refs(term)
+            result = refs if result is None else result & refs
+            if not result: break
+        result = set(result or ())
+        result.update(ref for ref, name in self.names if q in name)
+        return result
\ No newline at end of file
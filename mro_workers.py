@@ -0,0 +1,162 @@
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta
+import io
+import json
+import base64
+import zlib
+
+# =============================================================================
+# CPU WORKERS
+# Plain functions with no Streamlit state, so the app's process pool can
+# pickle them by reference and run them outside the server process.
+# =============================================================================
+
+def parse_upload(file_name, payload):
+    """Parses an uploaded Excel/CSV file (raw bytes) into a typed dataframe"""
+    try:
+        buffer = io.BytesIO(payload)
+        if file_name.endswith('.csv'): df = pd.read_csv(buffer, dtype=str, keep_default_na=False)
+        else: df = pd.read_excel(buffer, dtype=str, keep_default_na=False)
+        for col in df.columns:
+            if 'date' in col.lower(): df[col] = pd.to_datetime(df[col], errors='coerce', dayfirst=True)
+            else:
+                try: df[col] = pd.to_numeric(df[col], errors='ignore')
+                except: pass
+        return df.fillna("")
+    except: return None
+
+def filter_date(df, date_col, days):
+    if days == 0 or not days or date_col not in df.columns: return df
+    try:
+        temp_df = df.copy()
+        temp_df[date_col] = pd.to_datetime(temp_df[date_col], dayfirst=True, errors='coerce')
+        cutoff = datetime.now() - timedelta(days=days)
+        return df.loc[temp_df[temp_df[date_col] >= cutoff].index]
+    except: return df
+
+def process_report_dataframe(df_raw, job_config):
+    """Processes filters and returns a CLEAN DATAFRAME"""
+    try:
+        df = df_raw.copy()
+        filters = job_config.get('filters_config', {})
+        if filters is None: filters = {}
+
+        # 1. Master Filters
+        for col, selected_vals in filters.items():
+            if col not in ["retention_days", "date_column", "display_columns", "custom_code"] and col in df.columns:
+                if isinstance(selected_vals, list):
+                    if selected_vals: df = df[df[col].astype(str).isin(selected_vals)]
+                else:
+                    if selected_vals and selected_vals != "ALL": df = df[df[col].astype(str) == selected_vals]
+
+        # 2. Date
+        days = filters.get("retention_days", 0)
+        date_col = filters.get("date_column")
+        if days and days > 0 and date_col and date_col in df.columns:
+             df = filter_date(df, date_col, days)
+
+        # 3. Code
+        code = filters.get("custom_code")
+        if code:
+            try: df = df.query(code)
+            except: pass
+
+        # 4. Columns
+        cols = filters.get("display_columns")
+        if cols:
+            valid_cols = [c for c in cols if c in df.columns]
+            if valid_cols: df = df[valid_cols]
+
+        return df
+    except Exception as e:
+        return None
+
+def write_report_file(df, fmt):
+    output = io.BytesIO()
+
+    if "CSV" in fmt:
+        df.to_csv(output, index=False)
+        mime = "text/csv"; ext = ".csv"
+    else:
+        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+            df.to_excel(writer, index=False, sheet_name='Report')
+        mime = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"; ext = ".xlsx"
+
+    output.seek(0)
+    return output, mime, ext
+
+# =============================================================================
+# CHANGE-ONLY DELIVERY
+# =============================================================================
+def _row_hashes(df):
+    return pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy(dtype="uint64")
+
+def _pack(raw):
+    return base64.b64encode(zlib.compress(raw)).decode()
+
+def _unpack(text):
+    return zlib.decompress(base64.b64decode(text))
+
+def _occurrences(hashes):
+    # (hash, n-th occurrence) pairs, so duplicate rows are matched one for one
+    return pd.MultiIndex.from_arrays([hashes, pd.Series(hashes).groupby(hashes).cumcount().to_numpy()])
+
+def diff_report_dataframe(df, previous, key_col=None):
+    """Compares a report frame against the fingerprint of its last delivery.
+    Returns (delta, fingerprint); delta is None when there is no usable baseline.
+    With a key column whose values are unique, rows are matched by key into added /
+    changed / removed. Otherwise rows are compared as a multiset of row hashes: an
+    edited row shows up as removed + added, and reordering changes nothing.
+    The fingerprint keeps the row labels (key column, else first column; a JSON list,
+    for the Removed sheet) and uint64 row hashes, both zlib-compressed."""
+    labels = None
+    if key_col and key_col in df.columns:
+        labels = df[key_col].astype(str)
+        if not labels.is_unique: labels = None
+    keyed = labels is not None
+    label_col = key_col if keyed else df.columns[0]
+    if not keyed: labels = df[label_col].astype(str)
+    hashes = _row_hashes(df)
+    fingerprint = {
+        "key": key_col if keyed else None, "columns": [str(c) for c in df.columns],
+        "keys": _pack(json.dumps(labels.tolist()).encode()), "hashes": _pack(hashes.tobytes()),
+    }
+    if not previous or previous.get("columns") != fingerprint["columns"] or previous.get("key") != fingerprint["key"]: return None, fingerprint
+    old_labels = json.loads(_unpack(previous["keys"]))
+    old_hashes = np.frombuffer(_unpack(previous["hashes"]), dtype="uint64")
+    if keyed:
+        old = pd.Series(old_hashes, index=old_labels)
+        known = labels.isin(old.index).to_numpy()
+        changed = known & (old.reindex(labels.to_numpy()).to_numpy() != hashes)
+        removed = old.index[~old.index.isin(labels)]
+        return {"added": df[~known], "changed": df[changed], "removed": pd.DataFrame({label_col: list(removed)})}, fingerprint
+    new_ids, old_ids = _occurrences(hashes), _occurrences(old_hashes)
+    removed = np.flatnonzero(~old_ids.isin(new_ids))
+    delta = {"added": df[~new_ids.isin(old_ids)], "removed": pd.DataFrame({label_col: [old_labels[i] for i in removed]})}
+    return delta, fingerprint
+
+def build_delivery_file(df, fmt, previous, key_col=None):
+    """Delta export (Added / Changed / Removed, or Added / Removed without a key column) of
+    an already-filtered report against the previous fingerprint, or a full export when
+    there is no usable baseline.
+    Returns (output, mime, ext, fingerprint); the caller decides when the fingerprint
+    becomes the new baseline."""
+    try:
+        if len(df.columns) == 0: return (*write_report_file(df, fmt), None)
+        delta, fingerprint = diff_report_dataframe(df, previous, key_col)
+        if delta is None: return (*write_report_file(df, fmt), fingerprint)
+
+        output = io.BytesIO()
+        if "CSV" in fmt:
+            parts = [part.assign(_change=label) for label, part in delta.items()]
+            pd.concat(parts, ignore_index=True).to_csv(output, index=False)
+            mime = "text/csv"; ext = "_changes.csv"
+        else:
+            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+                for label, part in delta.items(): part.to_excel(writer, index=False, sheet_name=label.capitalize())
+            mime = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"; ext = "_changes.xlsx"
+        output.seek(0)
+        return output, mime, ext, fingerprint
+    except Exception as e:
+        return None, str(e), None, None
\ No newline at end of file
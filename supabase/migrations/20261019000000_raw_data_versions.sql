@@ -0,0 +1,11 @@
+-- Pointer to the live version of each owner's raw data.
+-- A sync writes its rows under a fresh key (owner_email column of raw_data_table)
+-- and only then repoints live_key, so readers never see a partial or empty dataset.
+create table if not exists raw_data_versions (
+    owner_email text primary key,
+    live_key text not null,
+    updated_at timestamptz not null default now()
+);
+
+-- Version lookups, paged reads (ordered by id) and old-version deletes all filter on owner_email.
+create index if not exists raw_data_table_owner_email_id_idx on raw_data_table (owner_email, id);
@@ -0,0 +1,11 @@
+-- Change-only report delivery.
+-- delivery_mode is only written by the app for jobs that use 'Changes only'.
+alter table jobs_table add column if not exists delivery_mode text;
+
+-- Baseline of each job's last delivered output (compressed row keys + row hashes).
+-- Kept out of jobs_table so job lists don't download it.
+create table if not exists report_fingerprints (
+    job_id bigint primary key references jobs_table (id) on delete cascade,
+    fingerprint jsonb not null,
+    updated_at timestamptz not null default now()
+);
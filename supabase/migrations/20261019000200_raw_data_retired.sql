@@ -0,0 +1,6 @@
+-- Data versions replaced by a newer sync. Their rows are only deleted once retired_at
+-- is older than the app's grace period, so loads still paging the old version can finish.
+create table if not exists raw_data_retired (
+    data_key text primary key,
+    retired_at timestamptz not null default now()
+);
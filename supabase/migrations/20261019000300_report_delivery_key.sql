@@ -0,0 +1,3 @@
+-- Column a 'Changes only' job matches rows on between deliveries (null: compare whole rows).
+-- Only written by the app for jobs that set one.
+alter table jobs_table add column if not exists delivery_key text;
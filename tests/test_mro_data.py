@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from mro_data import AsyncDataLayer, FakePostgrest
+
+
+JOBS = [
+    {"id": 1, "owner_email": "a@x.com", "task_name": "Daily A320", "folder_id": 10, "active": True},
+    {"id": 2, "owner_email": "a@x.com", "task_name": "Weekly B737", "folder_id": 10, "active": False},
+    {"id": 3, "owner_email": "b@x.com", "task_name": "Monthly", "folder_id": None, "active": True},
+]
+
+
+@pytest.fixture
+def db():
+    return AsyncDataLayer("http://fake", "key", transport=FakePostgrest({"jobs_table": JOBS}).transport())
+
+
+def test_select_filters_and_order(db):
+    rows = db.run(db.select("jobs_table", filters=[("owner_email", "eq", "a@x.com")], order="id.desc"))
+    assert [r["id"] for r in rows] == [2, 1]
+
+    rows = db.run(db.select("jobs_table", columns="id", filters=[("folder_id", "eq", 10), ("active", "eq", True)]))
+    assert rows == [{"id": 1}]
+
+    rows = db.run(db.select("jobs_table", columns="id", filters=[("id", "in", [1, 3]), ("owner_email", "neq", "b@x.com")]))
+    assert rows == [{"id": 1}]
+
+
+def test_select_count(db):
+    rows, total = db.run(db.select("jobs_table", columns="id", filters=[("owner_email", "eq", "a@x.com")], rows=(0, 0), count=True))
+    assert len(rows) == 1 and total == 2
+
+
+def test_select_all_pages_past_server_cap():
+    fake = FakePostgrest({"raw_data_table": [{"id": i, "owner_email": "a@x.com", "row_data": {"n": i}} for i in range(2500)]})
+
+    def capped(request):
+        # Mimics a PostgREST max-rows setting below the requested page size
+        res = fake.handle(request)
+        return httpx.Response(200, json=json.loads(res.content)[:400], headers=res.headers)
+
+    db = AsyncDataLayer("http://fake", "key", transport=httpx.MockTransport(capped))
+    rows = db.run(db.select_all("raw_data_table", columns="row_data", filters=[("owner_email", "eq", "a@x.com")], order="id", page=1000))
+    assert [r["row_data"]["n"] for r in rows] == list(range(2500))
+
+
+def test_select_all_raises_when_pages_miss_rows():
+    fake = FakePostgrest({"raw_data_table": [{"id": i, "owner_email": "a@x.com"} for i in range(2500)]})
+
+    def shrinking(request):
+        # Later pages come back empty, as if the version were deleted mid-read
+        if request.headers["range"].startswith("0-"): return fake.handle(request)
+        return httpx.Response(200, json=[], headers={"Content-Range": "*/0"})
+
+    db = AsyncDataLayer("http://fake", "key", transport=httpx.MockTransport(shrinking))
+    with pytest.raises(ValueError):
+        db.run(db.select_all("raw_data_table", columns="id", filters=[("owner_email", "eq", "a@x.com")], order="id", page=1000))
+
+
+def test_gather_returns_failures_in_place(db):
+    jobs, bad = db.gather(db.select("jobs_table", columns="id", filters=[("id", "eq", 3)]), db.select("jobs_table", filters=[("id", "like", "3")]))
+    assert jobs == [{"id": 3}]
+    assert isinstance(bad, httpx.HTTPStatusError)
+
+
+def test_gather_timeout_does_not_raise():
+    async def slow(request):
+        await asyncio.sleep(1)
+        return httpx.Response(200, json=[])
+
+    db = AsyncDataLayer("http://fake", "key", transport=httpx.MockTransport(slow))
+    results = db.gather(db.select("jobs_table"), db.select("folders_table"), timeout=0.1)
+    assert len(results) == 2 and all(isinstance(r, Exception) for r in results)
@@ -0,0 +1,31 @@
+from mro_search import SearchIndex
+
+
+JOBS = [
+    {"id": 1, "task_name": "B737-800 Backlog", "recipient": "jane.doe@airline.com", "email_subject": "Weekly"},
+    {"id": 2, "task_name": "A320_Daily", "recipient": "ops@airline.com", "email_subject": "Due list"},
+    {"id": 3, "task_name": "Engine Shop", "recipient": "", "email_subject": None},
+]
+FOLDERS = [{"id": 10, "name": "Customer-KLM"}, {"id": 11, "name": "ACME Leasing"}]
+
+
+def test_tokens_split_on_punctuation():
+    index = SearchIndex(JOBS, FOLDERS)
+    assert index.search("737") == {("job", 1)}
+    assert index.search("800") == {("job", 1)}
+    assert index.search("daily") == {("job", 2)}
+    assert index.search("320") == {("job", 2)}
+    assert index.search("due") == {("job", 2)}
+    assert index.search("jane") == {("job", 1)}
+    assert index.search("klm") == {("folder", 10)}
+    assert index.search("acme") == {("folder", 11)}
+
+
+def test_every_substring_match_still_hits():
+    index = SearchIndex(JOBS, FOLDERS)
+    for query in ["37-8", "b737-800", "_dai", "320_daily", "gine sh", "mer-k"]:
+        assert index.search(query), query
+    assert index.search("backlog weekly") == {("job", 1)}
+    assert index.search("engien") == {("job", 3)}
+    assert index.search("nothing") == set()
+    assert index.search("  ") is None
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from mro_workers import build_delivery_file, diff_report_dataframe
+
+
+def test_keyed_diff_reports_added_changed_and_removed_rows():
+    before = pd.DataFrame({"Type": ["A320"] * 4, "WO": ["", "2", "3", "5"], "Status": ["open", "x", "closed", "old"]})
+    delta, fingerprint = diff_report_dataframe(before, None, "WO")
+    assert delta is None and fingerprint["key"] == "WO"
+
+    after = pd.DataFrame({"Type": ["A320"] * 4, "WO": ["3", "", "2", "4"], "Status": ["done", "open", "x", "new"]})
+    delta, _ = diff_report_dataframe(after, fingerprint, "WO")
+    assert delta["added"]["WO"].tolist() == ["4"]
+    assert delta["changed"]["WO"].tolist() == ["3"]
+    assert delta["removed"]["WO"].tolist() == ["5"]
+
+
+def test_keyless_diff_compares_rows_as_a_multiset():
+    before = pd.DataFrame({"Type": ["A320"] * 5, "Status": ["open", "open", "x", "y", "z"]})
+    _, fingerprint = diff_report_dataframe(before, None)
+    assert fingerprint["key"] is None
+
+    delta, _ = diff_report_dataframe(before.iloc[::-1], fingerprint)
+    assert delta["added"].empty and delta["removed"].empty and "changed" not in delta
+
+    after = pd.DataFrame({"Type": ["A320"] * 4, "Status": ["z", "open", "x", "w"]})
+    delta, _ = diff_report_dataframe(after, fingerprint)
+    assert delta["added"]["Status"].tolist() == ["w"]
+    assert delta["removed"]["Type"].tolist() == ["A320", "A320"]
+
+
+def test_key_with_repeated_values_falls_back_to_multiset():
+    df = pd.DataFrame({"Type": ["A320", "A320"], "Status": ["open", "x"]})
+    _, fingerprint = diff_report_dataframe(df, None, "Type")
+    assert fingerprint["key"] is None
+
+
+def test_column_change_drops_the_baseline():
+    _, fingerprint = diff_report_dataframe(pd.DataFrame({"WO": ["1"], "Status": ["open"]}), None)
+    delta, _ = diff_report_dataframe(pd.DataFrame({"WO": ["1"], "Hrs": [2]}), fingerprint)
+    assert delta is None
+
+
+def test_build_delivery_file_csv_delta():
+    df = pd.DataFrame({"WO": ["1", "2"], "Status": ["open", "open"]})
+    output, _, ext, fingerprint = build_delivery_file(df, "CSV", None, "WO")
+    assert ext == ".csv" and fingerprint is not None
+
+    df.loc[1, "Status"] = "closed"
+    output, mime, ext, _ = build_delivery_file(df, "CSV", fingerprint, "WO")
+    assert (mime, ext) == ("text/csv", "_changes.csv")
+    rows = pd.read_csv(output, dtype=str)
+    assert rows[["WO", "_change"]].values.tolist() == [["2", "changed"]]